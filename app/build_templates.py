@@ -0,0 +1,13 @@
+import sys
+from jinja2 import Environment, FileSystemLoader
+from app.main import DEFAULT_TEMPLATE_PATH, COMPILED_TEMPLATES_PATH
+
+def build_templates(template_path=DEFAULT_TEMPLATE_PATH, target=COMPILED_TEMPLATES_PATH):
+    """Precompile the Jinja templates into a zip that ModuleLoader can import."""
+    env = Environment(loader=FileSystemLoader(template_path))
+    if not env.list_templates():
+        raise ValueError(f"No templates found in {template_path}")
+    env.compile_templates(target, zip='stored', ignore_errors=False)
+
+if __name__ == "__main__":
+    build_templates(*sys.argv[1:3])
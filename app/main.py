@@ -1,4 +1,6 @@
 import os
+import functools
+import hashlib
 import click
 import shutil
 import subprocess
@@ -6,12 +8,54 @@ import yaml
 import json
 import logging
 import sys
-from jinja2 import Template, Environment, FileSystemLoader
+import tempfile
+import tomllib
+from pathlib import Path
+from jinja2 import Template, Environment, FileSystemLoader, FileSystemBytecodeCache, ModuleLoader
 from pydantic import BaseModel, ValidationError, field_validator
+from openapi_python_client import Project
+from openapi_python_client.config import Config, ConfigFile, MetaType
+from openapi_python_client.parser import GeneratorData
+from openapi_python_client.parser.errors import ErrorLevel, GeneratorError
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DEFAULT_TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates')
+COMPILED_TEMPLATES_PATH = os.path.join(os.path.dirname(__file__), '_compiled_templates.zip')
+# An unset or empty XDG_CACHE_HOME falls back to ~/.cache, as the XDG spec requires.
+CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'openapi_to_click')
+
+# The only top-level spec keys the CLI generator reads.
+SPEC_KEYS = ('openapi', 'info', 'paths')
+# Path item keys that describe operations; the rest (summary, parameters, servers, ...) are skipped.
+HTTP_METHODS = frozenset(('get', 'put', 'post', 'delete', 'options', 'head', 'patch', 'trace'))
+# Buffer the streamed CLI output so rendered chunks are flushed in a few large writes.
+OUTPUT_BUFFER_SIZE = 1024 * 1024
+
+try:
+    from yaml import CSafeLoader as YAMLLoader
+except ImportError:
+    from yaml import SafeLoader as YAMLLoader
+    logger.warning("PyYAML was built without libyaml; falling back to the slower pure-Python loader.")
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _json_loads(data):
+    """Parse JSON bytes, using orjson when it is installed."""
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def _json_dumps(obj):
+    """Serialize to JSON bytes, using orjson when it is installed."""
+    if orjson:
+        # YAML specs commonly use unquoted status codes as keys.
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj).encode('utf-8')
+
 class OpenAPISpec(BaseModel):
     openapi: str
     info: dict
@@ -23,16 +67,76 @@ class OpenAPISpec(BaseModel):
             raise ValueError("Only OpenAPI 3.x specifications are supported.")
         return value
 
+def validate_spec(spec_data):
+    """Check the top-level shape of an OpenAPI specification without copying it."""
+    if not isinstance(spec_data, dict):
+        raise ValueError("The OpenAPI specification must be a mapping.")
+    version = spec_data.get('openapi')
+    if not isinstance(version, str) or not version.startswith("3."):
+        raise ValueError("Only OpenAPI 3.x specifications are supported.")
+    for key in ('info', 'paths'):
+        if not isinstance(spec_data.get(key), dict):
+            raise ValueError(f"The OpenAPI specification is missing a '{key}' mapping.")
+    return spec_data
+
+def _load_yaml(openapi_spec_path):
+    """Parse a YAML spec file."""
+    with open(openapi_spec_path, 'rb') as f:
+        return yaml.load(f, Loader=YAMLLoader)
+
+def _load_json(openapi_spec_path):
+    """Parse a JSON spec file."""
+    with open(openapi_spec_path, 'rb') as f:
+        return _json_loads(f.read())
+
+# Spec loaders keyed by lower-cased file extension.
+LOADERS = {'.yaml': _load_yaml, '.yml': _load_yaml, '.json': _load_json}
+
+def _get_loader(openapi_spec_path):
+    """Return the loader for a spec file, or None if its format is unsupported."""
+    return LOADERS.get(os.path.splitext(openapi_spec_path)[1].lower())
+
 def check_file_format(openapi_spec_path):
     """Check if the input file is in a supported format."""
-    if not (openapi_spec_path.endswith('.yaml') or
-            openapi_spec_path.endswith('.yml') or
-            openapi_spec_path.endswith('.json')):
+    if _get_loader(openapi_spec_path) is None:
         click.echo("Unsupported file format. Please provide a YAML or JSON file.", err=True)
         sys.exit(1)
 
-def generate_python_client(openapi_spec_path, output_path):
-    """Generate Python client from OpenAPI spec."""
+def generate_python_client(openapi_spec_path, output_path, spec_data, legacy_cli=False):
+    """Generate Python client from an already parsed OpenAPI spec."""
+    if legacy_cli:
+        return _generate_python_client_subprocess(openapi_spec_path, output_path)
+
+    config = Config.from_sources(
+        ConfigFile(),
+        MetaType.POETRY,
+        Path(openapi_spec_path),
+        "utf-8",
+        overwrite=True,
+        output_path=Path(output_path)
+    )
+    try:
+        openapi = GeneratorData.from_dict(spec_data, config=config)
+        if isinstance(openapi, GeneratorError):
+            errors = [openapi]
+        else:
+            errors = Project(openapi=openapi, config=config).build()
+    except Exception as e:
+        logger.error("Failed to generate client: %s", e)
+        return False
+
+    failed = False
+    for error in errors:
+        message = f"{error.header}: {error.detail}" if error.detail else error.header
+        if error.level == ErrorLevel.ERROR:
+            logger.error("Failed to generate client: %s", message)
+            failed = True
+        else:
+            logger.warning("%s", message)
+    return not failed
+
+def _generate_python_client_subprocess(openapi_spec_path, output_path):
+    """Generate Python client by running the openapi-python-client command."""
     try:
         subprocess.run([
             "openapi-python-client",
@@ -44,89 +148,223 @@ def generate_python_client(openapi_spec_path, output_path):
             "--overwrite"
         ], check=True)
     except subprocess.CalledProcessError as e:
-        logger.error(f"Failed to generate client: {e}")
+        logger.error("Failed to generate client: %s", e)
         return False
     return True
 
 def update_pyproject_toml(output_path):
     """Add click dependency to pyproject.toml if needed."""
     pyproject_path = os.path.join(output_path, 'pyproject.toml')
-    if os.path.exists(pyproject_path):
-        with open(pyproject_path, 'r') as f:
-            pyproject_content = f.readlines()
+    if not os.path.exists(pyproject_path):
+        return
+
+    with open(pyproject_path, 'r') as f:
+        pyproject_content = f.read()
+
+    dependencies = tomllib.loads(pyproject_content).get('tool', {}).get('poetry', {}).get('dependencies')
+    if dependencies is None or 'click' in dependencies:
+        return
 
-        with open(pyproject_path, 'w') as f:
-            for line in pyproject_content:
-                f.write(line)
-                if line.startswith('[tool.poetry.dependencies]'):
-                    if 'click' not in ''.join(pyproject_content):
-                        f.write('click = "^8.1.7"\n')
+    lines = pyproject_content.splitlines(keepends=True)
+    section_index = next((i for i, line in enumerate(lines) if line.startswith('[tool.poetry.dependencies]')), None)
+    if section_index is None:
+        logger.warning("Could not find a [tool.poetry.dependencies] header in %s; add click manually.", pyproject_path)
+        return
+    lines.insert(section_index + 1, 'click = "^8.1.7"\n')
+    with open(pyproject_path, 'w') as f:
+        f.write(''.join(lines))
 
 def initialize_package_directories(output_path):
     """Add __init__.py files to make directories packages."""
-    client_package_name = [d for d in os.listdir(output_path) if d != '.ruff_cache' and os.path.isdir(os.path.join(output_path, d))][0]
+    with os.scandir(output_path) as entries:
+        client_package_name = next(e.name for e in entries if e.name != '.ruff_cache' and e.is_dir(follow_symlinks=False))
     client_package_path = os.path.join(output_path, client_package_name)
     init_paths = [output_path, client_package_path]
     for path in init_paths:
         init_file = os.path.join(path, '__init__.py')
-        if not os.path.exists(init_file):
+        if not os.path.lexists(init_file):
             with open(init_file, 'w') as f:
                 f.write("# This file makes this directory a package.")
     return client_package_name
 
-def load_openapi_spec(openapi_spec_path):
-    """Load and validate OpenAPI specification."""
+def _select_spec_keys(spec_data):
+    """Keep only the top-level keys the CLI template uses."""
+    return {key: spec_data[key] for key in SPEC_KEYS if key in spec_data}
+
+def _json_cache_path(openapi_spec_path):
+    """Return the cache path of the parsed JSON copy of a spec, keyed on its path, mtime and size."""
+    stat = os.stat(openapi_spec_path)
+    key = hashlib.blake2b(
+        f"{os.path.abspath(openapi_spec_path)}:{stat.st_mtime_ns}:{stat.st_size}".encode()
+    ).hexdigest()
+    return os.path.join(CACHE_DIR, f"{key}.json")
+
+def _read_json_cache(cache_path):
+    """Return the cached spec, or None if there is no usable cache entry."""
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        with open(cache_path, 'rb') as f:
+            return _json_loads(f.read())
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable spec cache %s: %s", cache_path, e)
+        return None
+
+def _write_json_cache(cache_path, spec_data):
+    """Store the spec in the cache and return it as it will read back from the cache.
+
+    Returning the round-tripped data keeps cache misses and hits identical, e.g. unquoted
+    YAML status codes become string keys either way.
+    """
     try:
-        with open(openapi_spec_path, 'r') as f:
-            if openapi_spec_path.endswith(('.yaml', '.yml')):
-                spec_data = yaml.safe_load(f)
-            elif openapi_spec_path.endswith('.json'):
-                spec_data = json.load(f)
-            else:
-                raise ValueError("Unsupported file format")
+        data = _json_dumps(spec_data)
+    except (TypeError, ValueError) as e:
+        logger.warning("Not caching spec that can't be stored as JSON: %s", e)
+        return spec_data
+
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # Write to a temporary file first so an interrupted run never leaves a truncated entry.
+        fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, cache_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except OSError as e:
+        logger.warning("Could not write spec cache %s: %s", cache_path, e)
+    return _json_loads(data)
+
+def parse_openapi_spec(openapi_spec_path, json_cache=False):
+    """Parse an OpenAPI specification file into a dict."""
+    try:
+        loader = _get_loader(openapi_spec_path)
+        if loader is None:
+            raise ValueError("Unsupported file format")
+        # Only YAML is slow enough to parse for the JSON cache to pay off.
+        cache_path = _json_cache_path(openapi_spec_path) if json_cache and loader is _load_yaml else None
+        if cache_path:
+            spec_data = _read_json_cache(cache_path)
+            if spec_data is not None:
+                return spec_data
+        spec_data = loader(openapi_spec_path)
+        if spec_data is None:
+            # An empty YAML file or a JSON null; None is reserved for "already logged".
+            raise ValueError("The OpenAPI specification is empty.")
+        if cache_path:
+            spec_data = _write_json_cache(cache_path, spec_data)
+        return spec_data
     except Exception as e:
-        logger.error(f"Failed to load OpenAPI spec: {e}")
+        logger.error("Failed to load OpenAPI spec: %s", e)
         return None
 
+def validate_openapi_spec(spec_data, strict=False):
+    """Validate a parsed OpenAPI specification, using the Pydantic model when strict."""
     try:
-        spec = OpenAPISpec(**spec_data)
-        return spec
+        if strict:
+            OpenAPISpec(**_select_spec_keys(spec_data))
+        return validate_spec(spec_data)
     except ValidationError as e:
-        logger.error(f"OpenAPI specification validation failed: {e}")
+        # Leave out each error's input, which can be an entire multi-MB info or paths subtree.
+        logger.error("OpenAPI specification validation failed with %d error(s), showing up to 3: %s",
+                     e.error_count(), e.errors(include_url=False, include_input=False)[:3])
+        return None
+    except (TypeError, ValueError) as e:
+        logger.error("OpenAPI specification validation failed: %s", e)
+        return None
+
+def load_openapi_spec(openapi_spec_path, json_cache=False, strict=False):
+    """Load and validate OpenAPI specification."""
+    spec_data = parse_openapi_spec(openapi_spec_path, json_cache)
+    if spec_data is None:
         return None
+    return validate_openapi_spec(spec_data, strict)
+
+class _BestEffortBytecodeCache(FileSystemBytecodeCache):
+    """Bytecode cache that logs a warning instead of failing when it can't be written."""
+
+    def dump_bytecode(self, bucket):
+        try:
+            super().dump_bytecode(bucket)
+        except OSError as e:
+            logger.warning("Could not write template bytecode cache: %s", e)
+
+def _compiled_templates_are_current(template_path):
+    """Check that the precompiled templates exist and are not older than the template source."""
+    if not os.path.exists(COMPILED_TEMPLATES_PATH):
+        return False
+    source_path = os.path.join(template_path, 'cli_template.jinja2')
+    if os.path.exists(source_path) and os.path.getmtime(source_path) > os.path.getmtime(COMPILED_TEMPLATES_PATH):
+        logger.warning("Ignoring %s because it is older than %s; rebuild it with "
+                       "'python -m app.build_templates'.", COMPILED_TEMPLATES_PATH, source_path)
+        return False
+    return True
+
+@functools.lru_cache(maxsize=None)
+def _get_template(template_path):
+    """Load the CLI template, reusing the compiled template for a given path."""
+    if template_path == DEFAULT_TEMPLATE_PATH and _compiled_templates_are_current(template_path):
+        env = Environment(loader=ModuleLoader(COMPILED_TEMPLATES_PATH))
+        return env.get_template('cli_template.jinja2')
+
+    bytecode_cache_dir = os.path.join(CACHE_DIR, 'jinja')
+    try:
+        os.makedirs(bytecode_cache_dir, exist_ok=True)
+        bytecode_cache = _BestEffortBytecodeCache(directory=bytecode_cache_dir)
+    except OSError as e:
+        logger.warning("Template bytecode cache disabled: %s", e)
+        bytecode_cache = None
+    env = Environment(
+        loader=FileSystemLoader(template_path),
+        bytecode_cache=bytecode_cache,
+        auto_reload=False
+    )
+    return env.get_template('cli_template.jinja2')
 
 def generate_cli_code(template_path, client_module, paths):
-    """Generate CLI code using the template."""
-    env = Environment(loader=FileSystemLoader(template_path))
+    """Generate CLI code using the template, as a lazy stream of rendered chunks.
+
+    Only loading the template and building its context happen here; render errors are
+    raised while the stream is consumed.
+    """
     try:
-        template = env.get_template('cli_template.jinja2')
-        endpoint_imports = []
-        function_mappings = {}
-
-        for path, methods in paths.items():
-            for method, details in methods.items():
-                operation_id = details.get('operationId', method).replace("__", "_")
-                module_name = operation_id.lower()
-                import_alias = f"{operation_id}_import"
-                import_statement = f"from {client_module}.api.default.{module_name} import sync_detailed as {import_alias}"
-                endpoint_imports.append(import_statement)
-                function_mappings[operation_id] = import_alias
-
-        return template.render(
+        template = _get_template(template_path)
+        operation_paths = {
+            path: {method: details for method, details in path_item.items() if method in HTTP_METHODS}
+            for path, path_item in paths.items()
+        }
+        operation_ids = [
+            details.get('operationId', method).replace("__", "_")
+            for methods in operation_paths.values()
+            for method, details in methods.items()
+        ]
+        import_prefix = f"from {client_module}.api.default."
+        endpoint_imports = [
+            f"{import_prefix}{operation_id.lower()} import sync_detailed as {operation_id}_import"
+            for operation_id in operation_ids
+        ]
+        function_mappings = {operation_id: f"{operation_id}_import" for operation_id in operation_ids}
+
+        return template.stream(
             client_module=client_module,
-            paths=paths,
+            paths=operation_paths,
             endpoint_imports=endpoint_imports,
             function_mappings=function_mappings
         )
     except Exception as e:
-        logger.error(f"Failed to generate CLI code: {e}")
+        logger.error("Failed to generate CLI code: %s", e)
         return None
 
 @click.command()
 @click.argument('openapi_spec_path', type=click.Path(exists=True))
 @click.argument('output_path', type=click.Path())
 @click.option('--template-path', type=click.Path(), default=None, help='Path to the directory containing the Jinja templates.')
-def generate_cli(openapi_spec_path, output_path, template_path):
+@click.option('--json-cache', is_flag=True, default=False, help='Cache a parsed JSON copy of a YAML spec and reuse it on later runs.')
+@click.option('--legacy-cli', is_flag=True, default=False, help='Run the openapi-python-client command instead of calling it in-process.')
+@click.option('--strict', is_flag=True, default=False, help='Validate the spec with the full Pydantic model.')
+def generate_cli(openapi_spec_path, output_path, template_path, json_cache, legacy_cli, strict):
     """
     Generate a command-line interface (CLI) for an OpenAPI specification.
 
@@ -134,38 +372,63 @@ def generate_cli(openapi_spec_path, output_path, template_path):
     - OPENAPI_SPEC_PATH: Path to the OpenAPI specification file (YAML/JSON).
     - OUTPUT_PATH: Directory where the generated CLI will be saved.
     - TEMPLATE_PATH: Path to the directory containing the Jinja templates (optional).
+    - JSON_CACHE: Reuse a parsed JSON copy of a YAML spec on later runs (optional).
+    - LEGACY_CLI: Generate the client with the openapi-python-client command (optional).
+    - STRICT: Validate the spec with the full Pydantic model (optional).
     """
     check_file_format(openapi_spec_path)
 
     if not os.path.exists(output_path):
         os.makedirs(output_path)
 
-    if not generate_python_client(openapi_spec_path, output_path):
+    spec_data = parse_openapi_spec(openapi_spec_path, json_cache)
+    if spec_data is None:
         return
 
-    update_pyproject_toml(output_path)
-    client_package_name = initialize_package_directories(output_path)
-
-    spec = load_openapi_spec(openapi_spec_path)
+    spec = validate_openapi_spec(spec_data, strict)
     if not spec:
         return
 
+    if not generate_python_client(openapi_spec_path, output_path, spec_data, legacy_cli):
+        return
+
+    update_pyproject_toml(output_path)
+    client_package_name = initialize_package_directories(output_path)
+
     if not template_path:
-        template_path = os.path.join(os.path.dirname(__file__), 'templates')
+        template_path = DEFAULT_TEMPLATE_PATH
 
-    cli_code = generate_cli_code(template_path, client_package_name, spec.paths)
-    if not cli_code:
+    cli_code = generate_cli_code(template_path, client_package_name, spec['paths'])
+    if cli_code is None:
         return
 
     cli_file_path = os.path.join(output_path, 'cli.py')
+    # Render into a temporary file so a failed run never clobbers an existing cli.py.
     try:
-        with open(cli_file_path, 'w') as cli_file:
-            cli_file.write(cli_code)
+        fd, tmp_path = tempfile.mkstemp(dir=output_path, suffix='.py.tmp')
+    except OSError as e:
+        logger.error("Failed to write CLI code to file: %s", e)
+        return
+    try:
+        with os.fdopen(fd, 'wb', buffering=OUTPUT_BUFFER_SIZE) as cli_file:
+            cli_code.dump(cli_file, encoding='utf-8')
+        # mkstemp creates the file as 0600; give cli.py the usual umask-based mode.
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_path, 0o666 & ~umask)
+        os.replace(tmp_path, cli_file_path)
+    except OSError as e:
+        logger.error("Failed to write CLI code to file: %s", e)
+        os.unlink(tmp_path)
+        return
     except Exception as e:
-        logger.error(f"Failed to write CLI code to file: {e}")
+        # The template is rendered lazily while writing, so render errors surface here.
+        logger.error("Failed to generate CLI code: %s", e)
+        os.unlink(tmp_path)
         return
 
     click.echo(f"CLI generated at {cli_file_path}")
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     generate_cli()
@@ -4,8 +4,14 @@ import tempfile
 import shutil
 import yaml
 import json
+import datetime
 from click.testing import CliRunner
-from app.main import generate_cli, OpenAPISpec
+from openapi_python_client.parser.errors import ErrorLevel, GeneratorError
+from app.build_templates import build_templates
+from app.main import (
+    generate_cli, generate_cli_code, generate_python_client, update_pyproject_toml, load_openapi_spec,
+    validate_openapi_spec, validate_spec, OpenAPISpec, DEFAULT_TEMPLATE_PATH, _get_template
+)
 
 @pytest.fixture
 def temp_dir():
@@ -14,6 +20,13 @@ def temp_dir():
     yield temp_dir
     shutil.rmtree(temp_dir)
 
+@pytest.fixture(autouse=True)
+def cache_dir(temp_dir, monkeypatch):
+    """Keep the template and spec caches inside the temporary directory."""
+    cache_dir = os.path.join(temp_dir, "cache")
+    monkeypatch.setattr("app.main.CACHE_DIR", cache_dir)
+    return cache_dir
+
 @pytest.fixture
 def valid_openapi_spec():
     """Create a valid OpenAPI 3.0 specification."""
@@ -56,6 +69,38 @@ class TestOpenAPISpec:
         with pytest.raises(ValueError, match="Only OpenAPI 3.x specifications are supported"):
             OpenAPISpec(**invalid_spec)
 
+class TestValidateSpec:
+    def test_valid_spec(self, valid_openapi_spec):
+        """Test that a valid OpenAPI spec is returned unchanged."""
+        assert validate_spec(valid_openapi_spec) is valid_openapi_spec
+
+    def test_invalid_version(self):
+        """Test that an invalid OpenAPI version is rejected."""
+        invalid_spec = {
+            "openapi": "2.0.0",
+            "info": {"title": "Test API", "version": "1.0.0"},
+            "paths": {}
+        }
+        with pytest.raises(ValueError, match="Only OpenAPI 3.x specifications are supported"):
+            validate_spec(invalid_spec)
+
+    def test_missing_paths(self):
+        """Test that a spec without paths is rejected."""
+        invalid_spec = {
+            "openapi": "3.0.0",
+            "info": {"title": "Test API", "version": "1.0.0"}
+        }
+        with pytest.raises(ValueError, match="is missing a 'paths' mapping"):
+            validate_spec(invalid_spec)
+
+def test_strict_validation_error_omits_input(valid_openapi_spec, caplog):
+    """Test that strict validation errors are logged without the offending input."""
+    valid_openapi_spec["info"] = ["large-info-subtree"]
+
+    assert validate_openapi_spec(valid_openapi_spec, strict=True) is None
+    assert "1 error(s)" in caplog.text
+    assert "large-info-subtree" not in caplog.text
+
 class TestCLIGenerator:
     def test_cli_generation_yaml(self, temp_dir, valid_openapi_spec):
         """Test CLI generation with YAML spec file."""
@@ -119,6 +164,170 @@ class TestCLIGenerator:
             assert os.path.exists(os.path.join(output_dir, "cli.py"))
             assert "CLI generated at" in result.output
 
+    def test_template_render_error(self, temp_dir, valid_openapi_spec, caplog):
+        """Test that no partial cli.py is left behind when the template fails to render."""
+        runner = CliRunner()
+
+        with runner.isolated_filesystem(temp_dir=temp_dir) as td:
+            spec_path = os.path.join(td, "openapi.json")
+            with open(spec_path, 'w') as f:
+                json.dump(valid_openapi_spec, f)
+
+            output_dir = os.path.join(td, "output")
+            template_dir = os.path.join(td, "templates")
+            os.makedirs(template_dir)
+            with open(os.path.join(template_dir, "cli_template.jinja2"), "w") as f:
+                f.write("# Generated CLI\n{{ missing_function() }}\n")
+
+            result = runner.invoke(generate_cli, [
+                spec_path,
+                output_dir,
+                "--template-path",
+                template_dir
+            ])
+
+            assert result.exit_code == 0
+            assert not os.path.exists(os.path.join(output_dir, "cli.py"))
+            assert "CLI generated at" not in result.output
+            assert "Failed to generate CLI code: 'missing_function' is undefined" in caplog.text
+            assert "Failed to write CLI code to file" not in caplog.text
+
+    def test_existing_cli_survives_render_error(self, temp_dir, valid_openapi_spec):
+        """Test that a failed render leaves the cli.py from a previous run untouched."""
+        runner = CliRunner()
+
+        with runner.isolated_filesystem(temp_dir=temp_dir) as td:
+            spec_path = os.path.join(td, "openapi.json")
+            with open(spec_path, 'w') as f:
+                json.dump(valid_openapi_spec, f)
+
+            output_dir = os.path.join(td, "output")
+            os.makedirs(output_dir)
+            cli_path = os.path.join(output_dir, "cli.py")
+            with open(cli_path, "w") as f:
+                f.write("# Previous CLI\n")
+
+            template_dir = os.path.join(td, "templates")
+            os.makedirs(template_dir)
+            with open(os.path.join(template_dir, "cli_template.jinja2"), "w") as f:
+                f.write("# Generated CLI\n{{ missing_function() }}\n")
+
+            result = runner.invoke(generate_cli, [
+                spec_path,
+                output_dir,
+                "--template-path",
+                template_dir
+            ])
+
+            assert result.exit_code == 0
+            with open(cli_path) as f:
+                assert f.read() == "# Previous CLI\n"
+            assert not [name for name in os.listdir(output_dir) if name.endswith(".tmp")]
+
+    def test_cli_path_is_directory(self, temp_dir, valid_openapi_spec, caplog):
+        """Test that an unwritable cli.py path is reported instead of raising."""
+        runner = CliRunner()
+
+        with runner.isolated_filesystem(temp_dir=temp_dir) as td:
+            spec_path = os.path.join(td, "openapi.json")
+            with open(spec_path, 'w') as f:
+                json.dump(valid_openapi_spec, f)
+
+            output_dir = os.path.join(td, "output")
+            os.makedirs(os.path.join(output_dir, "cli.py"))
+
+            template_dir = os.path.join(td, "templates")
+            os.makedirs(template_dir)
+            with open(os.path.join(template_dir, "cli_template.jinja2"), "w") as f:
+                f.write("# Generated CLI\n")
+
+            result = runner.invoke(generate_cli, [
+                spec_path,
+                output_dir,
+                "--template-path",
+                template_dir
+            ])
+
+            assert result.exit_code == 0
+            assert result.exception is None
+            assert "Failed to write CLI code to file" in caplog.text
+            assert not [name for name in os.listdir(output_dir) if name.endswith(".tmp")]
+
+    def test_empty_spec(self, temp_dir, caplog):
+        """Test that an empty spec file is reported instead of exiting silently."""
+        runner = CliRunner()
+
+        with runner.isolated_filesystem(temp_dir=temp_dir) as td:
+            spec_path = os.path.join(td, "openapi.yaml")
+            open(spec_path, "w").close()
+            output_dir = os.path.join(td, "output")
+
+            result = runner.invoke(generate_cli, [spec_path, output_dir])
+
+            assert result.exit_code == 0
+            assert "Failed to load OpenAPI spec: The OpenAPI specification is empty." in caplog.text
+            assert not os.path.exists(os.path.join(output_dir, "cli.py"))
+
+    def test_client_generation_error(self, temp_dir, valid_openapi_spec, caplog):
+        """Test that client generator errors are logged and no CLI is written."""
+        runner = CliRunner()
+        responses = valid_openapi_spec["paths"]["/test"]["get"]["responses"]
+        responses[200] = responses.pop("200")
+
+        with runner.isolated_filesystem(temp_dir=temp_dir) as td:
+            # An unquoted 200 status code key parses as an int, which the client generator rejects.
+            spec_path = os.path.join(td, "openapi.yaml")
+            with open(spec_path, 'w') as f:
+                yaml.dump(valid_openapi_spec, f)
+            output_dir = os.path.join(td, "output")
+
+            result = runner.invoke(generate_cli, [spec_path, output_dir])
+
+            assert result.exit_code == 0
+            assert "Failed to generate client" in caplog.text
+            assert not os.path.exists(os.path.join(output_dir, "cli.py"))
+
+    def test_legacy_cli(self, temp_dir, valid_openapi_spec, monkeypatch):
+        """Test that --legacy-cli runs the openapi-python-client command."""
+        runner = CliRunner()
+        commands = []
+
+        def fake_run(command, check):
+            commands.append(command)
+            os.makedirs(os.path.join(command[-2], "test_api_client"))
+
+        monkeypatch.setattr("app.main.subprocess.run", fake_run)
+
+        with runner.isolated_filesystem(temp_dir=temp_dir) as td:
+            spec_path = os.path.join(td, "openapi.json")
+            with open(spec_path, 'w') as f:
+                json.dump(valid_openapi_spec, f)
+            output_dir = os.path.join(td, "output")
+            template_dir = os.path.join(td, "templates")
+            os.makedirs(template_dir)
+            with open(os.path.join(template_dir, "cli_template.jinja2"), "w") as f:
+                f.write("# Generated CLI\n")
+
+            result = runner.invoke(generate_cli, [
+                spec_path,
+                output_dir,
+                "--template-path",
+                template_dir,
+                "--legacy-cli"
+            ])
+
+            assert result.exit_code == 0
+            assert commands == [[
+                "openapi-python-client",
+                "generate",
+                "--path",
+                spec_path,
+                "--output-path",
+                output_dir,
+                "--overwrite"
+            ]]
+            assert os.path.exists(os.path.join(output_dir, "cli.py"))
+
     def test_invalid_spec_path(self, temp_dir):
         """Test CLI generation with non-existent spec file."""
         runner = CliRunner()
@@ -143,6 +352,216 @@ class TestCLIGenerator:
             assert result.exit_code == 1
             assert "Unsupported file format" in result.output
 
+def test_template_is_cached_per_path(temp_dir):
+    """Test that the compiled template is reused for the same template path."""
+    with open(os.path.join(temp_dir, "cli_template.jinja2"), "w") as f:
+        f.write("# Generated CLI for {{ client_module }}\n")
+
+    template = _get_template(temp_dir)
+    assert _get_template(temp_dir) is template
+    assert template.render(client_module="test_client") == "# Generated CLI for test_client"
+
+def test_template_without_writable_cache(temp_dir, monkeypatch):
+    """Test that templates still load when the bytecode cache directory can't be created."""
+    blocker = os.path.join(temp_dir, "blocker")
+    open(blocker, "w").close()
+    monkeypatch.setattr("app.main.CACHE_DIR", os.path.join(blocker, "cache"))
+    with open(os.path.join(temp_dir, "cli_template.jinja2"), "w") as f:
+        f.write("# Generated CLI for {{ client_module }}\n")
+
+    assert _get_template(temp_dir).render(client_module="test_client") == "# Generated CLI for test_client"
+
+def test_template_with_unwritable_bytecode_cache(temp_dir, monkeypatch, caplog):
+    """Test that a bytecode cache that can't be written doesn't fail template loading."""
+    def raise_permission_error(*args, **kwargs):
+        raise PermissionError("read-only cache")
+
+    monkeypatch.setattr("jinja2.bccache.tempfile.NamedTemporaryFile", raise_permission_error)
+    with open(os.path.join(temp_dir, "cli_template.jinja2"), "w") as f:
+        f.write("# Generated CLI for {{ client_module }}\n")
+
+    template = _get_template(temp_dir)
+    assert template.render(client_module="test_client") == "# Generated CLI for test_client"
+    assert "Could not write template bytecode cache: read-only cache" in caplog.text
+
+def test_compiled_default_template(temp_dir, monkeypatch):
+    """Test that the default template is loaded from the precompiled zip when it is current."""
+    template_dir = os.path.join(temp_dir, "templates")
+    os.makedirs(template_dir)
+    template_file = os.path.join(template_dir, "cli_template.jinja2")
+    with open(template_file, "w") as f:
+        f.write("# Precompiled CLI for {{ client_module }}\n")
+    compiled_path = os.path.join(temp_dir, "_compiled_templates.zip")
+    build_templates(template_dir, compiled_path)
+
+    monkeypatch.setattr("app.main.DEFAULT_TEMPLATE_PATH", template_dir)
+    monkeypatch.setattr("app.main.COMPILED_TEMPLATES_PATH", compiled_path)
+    # Make the compiled zip the only source of the original text.
+    with open(template_file, "w") as f:
+        f.write("# Source CLI for {{ client_module }}\n")
+    source_mtime = os.path.getmtime(compiled_path) - 10
+    os.utime(template_file, (source_mtime, source_mtime))
+
+    _get_template.cache_clear()
+    template = _get_template(template_dir)
+    assert template.render(client_module="test_client") == "# Precompiled CLI for test_client"
+
+    # A source template edited after the zip was built takes precedence.
+    os.utime(template_file, (source_mtime + 20, source_mtime + 20))
+    _get_template.cache_clear()
+    template = _get_template(template_dir)
+    assert template.render(client_module="test_client") == "# Source CLI for test_client"
+    _get_template.cache_clear()
+
+def test_build_templates_without_templates(temp_dir):
+    """Test that building from a directory without templates fails instead of writing an empty zip."""
+    compiled_path = os.path.join(temp_dir, "_compiled_templates.zip")
+    with pytest.raises(ValueError, match="No templates found"):
+        build_templates(os.path.join(temp_dir, "missing"), compiled_path)
+    assert not os.path.exists(compiled_path)
+
+def test_default_template_path():
+    """Test that the default template path points at the bundled templates."""
+    assert os.path.exists(os.path.join(DEFAULT_TEMPLATE_PATH, "cli_template.jinja2"))
+
+class TestJSONCache:
+    @pytest.fixture
+    def spec_path(self, temp_dir, valid_openapi_spec):
+        """Write a YAML spec to the temporary directory."""
+        spec_path = os.path.join(temp_dir, "openapi.yaml")
+        with open(spec_path, 'w') as f:
+            yaml.dump(valid_openapi_spec, f)
+        return spec_path
+
+    def cache_files(self, cache_dir):
+        if not os.path.exists(cache_dir):
+            return []
+        return [os.path.join(cache_dir, name) for name in os.listdir(cache_dir) if name.endswith(".json")]
+
+    def test_cache_hit(self, cache_dir, spec_path, valid_openapi_spec):
+        """Test that a YAML spec is cached as JSON and read back from the cache while unchanged."""
+        spec = load_openapi_spec(spec_path, json_cache=True)
+        assert spec["paths"] == valid_openapi_spec["paths"]
+        [cache_file] = self.cache_files(cache_dir)
+
+        cached_spec = dict(spec, info={"title": "Cached API", "version": "1.0.0"})
+        with open(cache_file, 'w') as f:
+            json.dump(cached_spec, f)
+
+        assert load_openapi_spec(spec_path, json_cache=True)["info"]["title"] == "Cached API"
+
+    def test_cache_invalidated_by_spec_change(self, cache_dir, spec_path, valid_openapi_spec):
+        """Test that editing the spec changes the cache key."""
+        load_openapi_spec(spec_path, json_cache=True)
+        valid_openapi_spec["info"]["title"] = "Edited API"
+        with open(spec_path, 'w') as f:
+            yaml.dump(valid_openapi_spec, f)
+
+        assert load_openapi_spec(spec_path, json_cache=True)["info"]["title"] == "Edited API"
+        assert len(self.cache_files(cache_dir)) == 2
+
+    def test_truncated_cache_is_replaced(self, cache_dir, spec_path, valid_openapi_spec):
+        """Test that an unreadable cache entry is ignored and rewritten."""
+        load_openapi_spec(spec_path, json_cache=True)
+        [cache_file] = self.cache_files(cache_dir)
+        open(cache_file, 'w').close()
+
+        assert load_openapi_spec(spec_path, json_cache=True)["paths"] == valid_openapi_spec["paths"]
+        with open(cache_file) as f:
+            assert json.load(f)["paths"] == valid_openapi_spec["paths"]
+
+    def test_cache_miss_matches_cache_hit(self, cache_dir, spec_path):
+        """Test that the first --json-cache load returns the same data as later cache hits."""
+        with open(spec_path, 'a') as f:
+            f.write("x-status-codes:\n  200: OK\n")
+
+        miss = load_openapi_spec(spec_path, json_cache=True)
+        hit = load_openapi_spec(spec_path, json_cache=True)
+        assert miss == hit
+
+    def test_unserializable_spec_is_not_cached(self, cache_dir, spec_path, valid_openapi_spec, monkeypatch):
+        """Test that a spec the JSON fallback can't store is returned uncached."""
+        monkeypatch.setattr("app.main.orjson", None)
+        valid_openapi_spec["info"]["version"] = datetime.date(2021, 8, 1)
+        with open(spec_path, 'w') as f:
+            yaml.dump(valid_openapi_spec, f)
+
+        spec = load_openapi_spec(spec_path, json_cache=True)
+        assert spec["info"]["version"] == datetime.date(2021, 8, 1)
+        assert self.cache_files(cache_dir) == []
+
+    def test_unwritable_cache(self, temp_dir, spec_path, valid_openapi_spec, monkeypatch):
+        """Test that a cache directory that can't be created doesn't fail the load."""
+        blocker = os.path.join(temp_dir, "blocker")
+        open(blocker, 'w').close()
+        monkeypatch.setattr("app.main.CACHE_DIR", os.path.join(blocker, "cache"))
+
+        assert load_openapi_spec(spec_path, json_cache=True)["paths"] == valid_openapi_spec["paths"]
+
+def test_generate_python_client_logs_every_error(temp_dir, valid_openapi_spec, monkeypatch, caplog):
+    """Test that all client generator errors and warnings are logged, not just the first error."""
+    class FakeProject:
+        def __init__(self, openapi, config):
+            pass
+
+        def build(self):
+            return [
+                GeneratorError(header="First error", detail="bad schema"),
+                GeneratorError(header="Second error"),
+                GeneratorError(header="Some warning", level=ErrorLevel.WARNING),
+            ]
+
+    monkeypatch.setattr("app.main.Project", FakeProject)
+
+    assert not generate_python_client("openapi.json", temp_dir, valid_openapi_spec)
+    assert "Failed to generate client: First error: bad schema" in caplog.text
+    assert "Failed to generate client: Second error" in caplog.text
+    assert "Some warning" in caplog.text
+
+def test_generate_cli_code_skips_non_operation_keys(valid_openapi_spec):
+    """Test that path item keys other than HTTP methods do not become commands."""
+    paths = valid_openapi_spec["paths"]
+    paths["/test"]["summary"] = "Test path"
+    paths["/test"]["parameters"] = []
+    template_path = os.path.join(os.path.dirname(__file__), "..", "templates")
+
+    cli_code = "".join(generate_cli_code(template_path, "test_client", paths))
+
+    assert "from test_client.api.default.test_endpoint import sync_detailed as test_endpoint_import" in cli_code
+    assert "def test_endpoint(" in cli_code
+    assert "def summary(" not in cli_code
+    assert "def parameters(" not in cli_code
+
+def test_update_pyproject_toml(temp_dir):
+    """Test that click is added to the poetry dependencies exactly once."""
+    pyproject_path = os.path.join(temp_dir, "pyproject.toml")
+    with open(pyproject_path, "w") as f:
+        f.write('[tool.poetry]\ndescription = "A click-free client"\n\n'
+                '[tool.poetry.dependencies]\npython = "^3.12"\n')
+
+    update_pyproject_toml(temp_dir)
+    update_pyproject_toml(temp_dir)
+
+    with open(pyproject_path) as f:
+        content = f.read()
+    assert content.count('click = "^8.1.7"') == 1
+    assert '[tool.poetry.dependencies]\nclick = "^8.1.7"\npython = "^3.12"\n' in content
+
+@pytest.mark.parametrize("content", [
+    '[tool.poetry]\ndependencies = { python = "^3.12" }\n',
+    '[ tool.poetry.dependencies ]\npython = "^3.12"\n',
+])
+def test_update_pyproject_toml_without_section_header(temp_dir, content):
+    """Test that a dependencies table without a literal header line is left unchanged."""
+    pyproject_path = os.path.join(temp_dir, "pyproject.toml")
+    with open(pyproject_path, "w") as f:
+        f.write(content)
+
+    update_pyproject_toml(temp_dir)
+
+    with open(pyproject_path) as f:
+        assert f.read() == content
+
 def test_output_directory_creation(temp_dir, valid_openapi_spec):
     """Test that the output directory is created if it doesn't exist."""
     runner = CliRunner()